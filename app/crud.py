@@ -1,5 +1,10 @@
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import func, select, union_all
 from sqlalchemy.orm import Session
-from app import models, schemas
+from app import archive, models, schemas
+
+# 变更流水保留天数，超过的会被 compact_book_changes 清理
+BOOK_CHANGE_RETENTION_DAYS = 30
 
 def get_books(db: Session, skip: int = 0, limit: int = 10):
     return db.query(models.Book).offset(skip).limit(limit).all()
@@ -10,31 +15,146 @@ def get_book(db: Session, book_id: int):
 def create_book(db: Session, book: schemas.BookCreate):
     db_book = models.Book(**book.dict())
     db.add(db_book)
+    db.flush()  # 拿到自增 id 再写变更流水，和图书在同一个事务里提交
+    _record_book_change(db, db_book.id, "insert")
     db.commit()
-    db.refresh(db_book)
     return db_book
 
+# 批量插入：一个事务提交，每本书各记一条 insert 变更
+def create_books(db: Session, books: list[schemas.BookCreate]):
+    db_books = [models.Book(**book.dict()) for book in books]
+    db.add_all(db_books)
+    db.flush()
+    _record_book_changes(db, [(db_book.id, "insert") for db_book in db_books])
+    db.commit()
+    return db_books
+
+# 按 id 直接 UPDATE，用影响行数判断 404；
+# MySQL 方言默认开启 FOUND_ROWS，值没变的行也会计入 rowcount
 def update_book(db: Session, book_id: int, book: schemas.BookUpdate):
-    db_book = db.query(models.Book).filter(models.Book.id == book_id).first()
-    if db_book:
-        for key, value in book.dict().items():
-            setattr(db_book, key, value)
-        db.commit()
-        db.refresh(db_book)
-    return db_book
+    values = book.dict()
+    matched = (
+        db.query(models.Book)
+        .filter(models.Book.id == book_id)
+        .update(values, synchronize_session=False)
+    )
+    if not matched:
+        return None
+    _record_book_change(db, book_id, "update")
+    db.commit()
+    return models.Book(id=book_id, **values)
 
 def delete_book(db: Session, book_id: int):
     db_book = db.query(models.Book).filter(models.Book.id == book_id).first()
     if db_book:
         db.delete(db_book)
+        # 先把 DELETE 刷下去再锁计数器，和 create/update 一样先锁图书行再锁计数器，避免死锁
+        db.flush()
+        _record_book_change(db, book_id, "delete")  # 墓碑
         db.commit()
     return db_book
 
+# ---------- 图书变更流水（增量同步） ----------
+BOOK_CHANGE_COUNTER_ID = 1
+
+def ensure_book_change_counter(db: Session):
+    # 启动时建好计数器行，避免首次并发写图书时两边同时插入；已有流水时从最大 seq 接着分配
+    if db.get(models.BookChangeCounter, BOOK_CHANGE_COUNTER_ID) is None:
+        last_seq = db.query(func.max(models.BookChange.seq)).scalar() or 0
+        db.add(models.BookChangeCounter(id=BOOK_CHANGE_COUNTER_ID, last_seq=last_seq))
+        db.commit()
+
+def _record_book_change(db: Session, book_id: int, op: str):
+    _record_book_changes(db, [(book_id, op)])
+
+def _record_book_changes(db: Session, changes: list[tuple[int, str]]):
+    """
+    在图书写入的同一事务里锁住计数器行分配 seq。行锁持有到 commit，
+    后来的事务只能等前一个提交后才能拿号，所以不会出现小 seq 比大 seq 晚提交的情况。
+    """
+    counter = (
+        db.query(models.BookChangeCounter)
+        .filter(models.BookChangeCounter.id == BOOK_CHANGE_COUNTER_ID)
+        .with_for_update()
+        .first()
+    )
+    if counter is None:
+        counter = models.BookChangeCounter(id=BOOK_CHANGE_COUNTER_ID, last_seq=0)
+        db.add(counter)
+    seq = counter.last_seq
+    for book_id, op in changes:
+        seq += 1
+        db.add(models.BookChange(seq=seq, book_id=book_id, op=op))
+    counter.last_seq = seq
+
+def _book_change_head(db: Session) -> int:
+    # 计数器值随变更一起提交，读到的值之前的 seq 都已提交（或回滚），可以安全作为 token
+    return db.query(models.BookChangeCounter.last_seq).filter(
+        models.BookChangeCounter.id == BOOK_CHANGE_COUNTER_ID
+    ).scalar() or 0
+
+def get_book_changes(db: Session, since: int = 0, limit: int = 100):
+    """
+    返回 seq > since 的图书变更，同一本书只保留最新一条。
+    since 早于压缩水位时返回 resync_required，客户端需重新全量拉取。
+    """
+    floor = db.query(func.max(models.BookChangeCompaction.compacted_through)).scalar() or 0
+    if since < floor:
+        return {"changes": [], "next_token": max(_book_change_head(db), floor), "has_more": False, "resync_required": True}
+
+    rows = (
+        db.query(models.BookChange)
+        .filter(models.BookChange.seq > since)
+        .order_by(models.BookChange.seq)
+        .limit(limit + 1)
+        .all()
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if not rows:
+        return {"changes": [], "next_token": since, "has_more": False, "resync_required": False}
+
+    latest = {}
+    for row in rows:
+        latest[row.book_id] = row
+    live_ids = [book_id for book_id, row in latest.items() if row.op != "delete"]
+    books = {}
+    if live_ids:
+        books = {b.id: b for b in db.query(models.Book).filter(models.Book.id.in_(live_ids)).all()}
+
+    changes = []
+    for row in sorted(latest.values(), key=lambda r: r.seq):
+        book = books.get(row.book_id)
+        # 窗口之后又被删掉的书按墓碑返回，后面的 delete 记录再来一次也是幂等的
+        op = row.op if book is not None or row.op == "delete" else "delete"
+        changes.append({"seq": row.seq, "book_id": row.book_id, "op": op, "book": book})
+    return {"changes": changes, "next_token": rows[-1].seq, "has_more": has_more, "resync_required": False}
+
+def compact_book_changes(db: Session, retention_days: int = BOOK_CHANGE_RETENTION_DAYS) -> int:
+    """
+    清理 retention_days 之前的变更流水，并记录压缩水位，返回删除条数
+    """
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    through = (
+        db.query(func.max(models.BookChange.seq))
+        .filter(models.BookChange.changed_at < cutoff)
+        .scalar()
+    )
+    if through is None:
+        return 0
+    deleted = (
+        db.query(models.BookChange)
+        .filter(models.BookChange.seq <= through)
+        .delete(synchronize_session=False)
+    )
+    db.add(models.BookChangeCompaction(compacted_through=through))
+    db.commit()
+    return deleted
+
 def create_student(db: Session, student: schemas.StudentCreate):
     db_student = models.Student(**student.dict())
     db.add(db_student)
     db.commit()
-    db.refresh(db_student)
     return db_student
 
 # 学生相关操作
@@ -45,15 +165,41 @@ def create_book_order(db: Session, book_order: schemas.BookOrderCreate):
     db_order = models.BookOrder(**book_order.dict())
     db.add(db_order)
     db.commit()
-    db.refresh(db_order)
     return db_order
 
 # 借书订单
-def get_book_orders(db: Session, skip: int = 0, limit: int = 10):
-    return db.query(models.BookOrder).offset(skip).limit(limit).all()
+# since 为空时只查热表；归档表里确实有 since 之后借出的订单时才把归档表 UNION 进来
+# （按归档表实际数据判断，归档时用的天数可能和默认配置不同）
+def _order_history(db: Session, since: datetime | None = None, **filters):
+    hot = models.BookOrder
+    if since is not None and since.tzinfo is not None:
+        # 查询参数可能带时区（如 ...Z），库里存的是 naive UTC
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    if since is None or not archive.archive_has_orders_since(db, since):
+        query = db.query(hot).filter_by(**filters)
+        if since is not None:
+            query = query.filter(hot.borrow_date >= since)
+        return query.order_by(hot.id)
+
+    def _select(model, id_column):
+        return (
+            select(id_column.label("id"), *(getattr(model, c) for c in archive.ORDER_COLUMNS))
+            .where(*(getattr(model, key) == value for key, value in filters.items()))
+            .where(model.borrow_date >= since)
+        )
+
+    cold = models.BookOrderArchive
+    history = union_all(_select(cold, cold.order_id), _select(hot, hot.id)).subquery()
+    return db.query(history).order_by(history.c.id)
+
+def get_book_orders(db: Session, skip: int = 0, limit: int = 10, since: datetime | None = None):
+    return _order_history(db, since).offset(skip).limit(limit).all()
+
+def get_student_orders(db: Session, student_id: int, since: datetime | None = None):
+    return _order_history(db, since, student_id=student_id).all()
 
-def get_student_orders(db: Session, student_id: int):
-    return db.query(models.BookOrder).filter(models.BookOrder.student_id == student_id).all()
+def get_book_borrow_records(db: Session, book_id: int, since: datetime | None = None):
+    return _order_history(db, since, book_id=book_id).all()
 
 
 def student_exists(db: Session, student_id: int) -> bool:
@@ -65,12 +211,14 @@ def book_exists(db: Session, book_id: int) -> bool:
 def get_order(db: Session, order_id: int):
     return db.query(models.BookOrder).filter(models.BookOrder.id == order_id).first()
 
+# 单条 UPDATE；路由里已经查过的订单在会话里会被同步更新，db.get 直接命中不再查库
 def mark_order_returned(db: Session, order_id: int, return_date):
-    order = get_order(db, order_id)
-    if not order:
+    matched = (
+        db.query(models.BookOrder)
+        .filter(models.BookOrder.id == order_id)
+        .update({"status": "returned", "return_date": return_date}, synchronize_session="evaluate")
+    )
+    if not matched:
         return None
-    order.status = "returned"
-    order.return_date = return_date
     db.commit()
-    db.refresh(order)
-    return order
\ No newline at end of file
+    return db.get(models.BookOrder, order_id)
@@ -1,11 +1,16 @@
 from fastapi import FastAPI
-from app import models, database
+from app import crud, models, database, profiling
 from app.routers import books, students,orders, auth
+from app.routers import profiling as profiling_router
 
 # 创建数据库（确保库存在）
 models.Base.metadata.create_all(bind=database.engine)
 app = FastAPI(title="Library Management System")
 
+# 按需剖析（默认关闭，见 app/profiling.py 配置区）
+app.add_middleware(profiling.ProfilingMiddleware)
+profiling.instrument_engine(database.engine)
+
 @app.on_event("startup")
 def startup_event():
     # 确保数据库存在
@@ -13,6 +18,12 @@ def startup_event():
     # 确保表存在
     models.Base.metadata.create_all(bind=database.engine)
     print("✅ 数据库表已确认存在！")
+    # 图书变更流水的 seq 计数器
+    db = database.SessionLocal()
+    try:
+        crud.ensure_book_change_counter(db)
+    finally:
+        db.close()
 
 
 # 注册路由
@@ -20,6 +31,7 @@ app.include_router(books.router)
 app.include_router(students.router)
 app.include_router(orders.router)
 app.include_router(auth.router)
+app.include_router(profiling_router.router)
 
 @app.get("/")
 def root():
@@ -1,7 +1,7 @@
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, Integer, String, BigInteger
 from .database import Base
 from sqlalchemy.orm import relationship
-from sqlalchemy import ForeignKey, DateTime
+from sqlalchemy import ForeignKey, DateTime, Index
 from datetime import datetime
 
 class Book(Base):
@@ -40,5 +40,57 @@ class BookOrder(Base):
     student = relationship("Student", back_populates="orders")
     book = relationship("Book", back_populates="orders")
 
+    # 在借查询走 (student_id/book_id, status)；归档扫描走 (status, return_date)
+    # 订单 id 不能复用：最新的订单被归档后，SQLite 默认和 MySQL 8.0 以前（重启后按 MAX(id)+1
+    # 重算自增值）都会把 id 再发一遍。SQLite 用 AUTOINCREMENT；MySQL 需 8.0+（自增计数器持久化）
+    __table_args__ = (
+        Index("ix_book_orders_student_status", "student_id", "status"),
+        Index("ix_book_orders_book_status", "book_id", "status"),
+        Index("ix_book_orders_status_return", "status", "return_date"),
+        {"sqlite_autoincrement": True},
+    )
+
+
+# 已归还的历史订单归档表，order_id 为原订单 id（唯一），主键单独自增
+class BookOrderArchive(Base):
+    __tablename__ = "book_orders_archive"
+
+    id = Column(Integer, primary_key=True, index=True)
+    order_id = Column(Integer, unique=True, nullable=False)
+    book_id = Column(Integer, index=True)       # 不加外键：归档数据不应阻塞图书/学生的删除
+    student_id = Column(Integer, index=True)
+    borrow_date = Column(DateTime, index=True)
+    return_date = Column(DateTime, nullable=True)
+    status = Column(String(50))
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
 Book.orders = relationship("BookOrder", back_populates="book")
 
+
+# 图书变更流水：每次增/改/删记录一条，seq 单调递增，供客户端增量同步
+class BookChange(Base):
+    __tablename__ = "book_changes"
+
+    seq = Column(BigInteger, primary_key=True, autoincrement=False)  # 由 BookChangeCounter 分配
+    book_id = Column(Integer, nullable=False, index=True)   # 不加外键：删除后仍要保留墓碑
+    op = Column(String(16), nullable=False)                 # insert, update, delete
+    changed_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+
+# 变更序号计数器（只有 id=1 一行）。写图书时 SELECT ... FOR UPDATE 锁住它再分配 seq，
+# 持锁到提交为止，保证 seq 顺序就是提交顺序，客户端按 seq 增量拉取不会漏掉晚提交的小 seq
+class BookChangeCounter(Base):
+    __tablename__ = "book_change_counter"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    last_seq = Column(BigInteger, nullable=False, default=0)
+
+
+# 变更流水压缩记录：compacted_through 及之前的 seq 已被清理
+class BookChangeCompaction(Base):
+    __tablename__ = "book_change_compactions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    compacted_through = Column(BigInteger, nullable=False)
+    compacted_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
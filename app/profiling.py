@@ -0,0 +1,249 @@
+# 按需请求剖析：
+# 1) 管理员在请求上带 X-Profile-Token 头（或 ?__profile=<token>），对单个请求做采样剖析；
+# 2) 按 PROFILE_SAMPLE_RATE 低频抽样请求，记录 SQL 及耗时，只保留最慢的 N 条。
+# 两者都关闭时中间件直接透传，不做任何额外工作。
+import contextvars
+import heapq
+import hmac
+import itertools
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from datetime import datetime
+from urllib.parse import parse_qs
+
+from sqlalchemy import event
+
+# ======== 配置区 ========
+PROFILE_ADMIN_TOKEN = os.getenv("PROFILE_ADMIN_TOKEN", "")              # 为空则关闭单请求剖析和管理接口
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))     # 慢请求抽样比例，0 为关闭
+PROFILE_SLOWEST_N = 20          # 慢请求只保留最慢的 N 条
+PROFILE_MAX_CAPTURES = 50       # 单请求剖析结果最多保留条数
+PROFILE_SAMPLE_INTERVAL = 0.005  # 栈采样间隔（秒）
+PROFILE_MAX_SQL = 200           # 每个请求最多记录的 SQL 条数
+# ========================
+
+PROFILE_HEADER = b"x-profile-token"
+PROFILE_QUERY = "__profile"
+# 剖析结果管理接口本身不剖析、不抽样，否则浏览一次就会产生新的 capture 把真正的结果挤掉
+ADMIN_PREFIX = "/admin/profiles"
+
+# 当前请求的 capture，经 contextvar 传到线程池里的同步路由和 SQLAlchemy 事件
+_current_capture = contextvars.ContextVar("profile_capture", default=None)
+
+_lock = threading.Lock()
+_profiles = OrderedDict()   # id -> capture（单请求剖析）
+_slowest = []               # (duration_ms, seq, capture) 小顶堆
+_seq = itertools.count()
+
+# 线程空闲时停在这些文件里（事件循环 select、线程池等任务），采样时跳过
+_IDLE_FILES = ("selectors.py", "threading.py", "queue.py")
+
+
+class Capture:
+    def __init__(self, kind: str, method: str, path: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind                  # profile, slow
+        self.method = method
+        self.path = path
+        self.status = None
+        self.started_at = datetime.utcnow()
+        self.duration_ms = 0.0
+        self.sql = []                     # [{"statement", "duration_ms"}]
+        self.stacks = Counter()           # 折叠栈 -> 采样次数
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration_ms, 3),
+            "sql_count": len(self.sql),
+            "sql_ms": round(sum(q["duration_ms"] for q in self.sql), 3),
+            "samples": sum(self.stacks.values()),
+        }
+
+    def detail(self, top: int = 30) -> dict:
+        data = self.summary()
+        data["sql"] = self.sql
+        data["top_functions"] = _top_functions(self.stacks, top)
+        return data
+
+    def folded(self) -> str:
+        # flamegraph.pl / speedscope 可直接读取的折叠栈格式
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+
+def check_admin_token(token: str | None) -> bool:
+    if not PROFILE_ADMIN_TOKEN or not token:
+        return False
+    return hmac.compare_digest(token, PROFILE_ADMIN_TOKEN)
+
+
+def list_captures() -> list[dict]:
+    with _lock:
+        captures = list(_profiles.values()) + [c for _, _, c in _slowest]
+    captures.sort(key=lambda c: c.started_at, reverse=True)
+    return [c.summary() for c in captures]
+
+
+def get_capture(capture_id: str) -> Capture | None:
+    with _lock:
+        if capture_id in _profiles:
+            return _profiles[capture_id]
+        for _, _, capture in _slowest:
+            if capture.id == capture_id:
+                return capture
+    return None
+
+
+def _store(capture: Capture):
+    with _lock:
+        if capture.kind == "profile":
+            _profiles[capture.id] = capture
+            while len(_profiles) > PROFILE_MAX_CAPTURES:
+                _profiles.popitem(last=False)
+        else:
+            item = (capture.duration_ms, next(_seq), capture)
+            if len(_slowest) < PROFILE_SLOWEST_N:
+                heapq.heappush(_slowest, item)
+            elif item[0] > _slowest[0][0]:
+                heapq.heapreplace(_slowest, item)
+
+
+def _top_functions(stacks: Counter, top: int) -> list[dict]:
+    # self：位于栈顶的次数；total：出现在栈中的次数（同一栈内只计一次）
+    self_counts, total_counts = Counter(), Counter()
+    for stack, count in stacks.items():
+        frames = stack.split(";")
+        self_counts[frames[-1]] += count
+        for frame in set(frames):
+            total_counts[frame] += count
+    return [
+        {"function": frame, "self": self_counts[frame], "total": total}
+        for frame, total in total_counts.most_common(top)
+    ]
+
+
+class _StackSampler(threading.Thread):
+    """
+    定时抓取所有线程的调用栈。同步路由跑在线程池里，cProfile 只能看到当前线程，
+    所以这里按进程采样；并发请求多时，结果里可能混入其它请求的栈。
+    """
+
+    def __init__(self, stacks: Counter, interval: float = PROFILE_SAMPLE_INTERVAL):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.stacks = stacks
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        me = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            for tid, frame in sys._current_frames().items():
+                if tid == me or frame.f_code.co_filename.endswith(_IDLE_FILES):
+                    continue
+                names = []
+                while frame is not None:
+                    code = frame.f_code
+                    names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(names))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def _wants_profile(scope) -> bool:
+    if not PROFILE_ADMIN_TOKEN:
+        return False
+    for name, value in scope.get("headers", ()):
+        if name == PROFILE_HEADER:
+            return check_admin_token(value.decode("latin-1"))
+    query = scope.get("query_string", b"")
+    if PROFILE_QUERY.encode() in query:
+        token = parse_qs(query.decode("latin-1")).get(PROFILE_QUERY, [None])[0]
+        return check_admin_token(token)
+    return False
+
+
+class ProfilingMiddleware:
+    """
+    纯 ASGI 中间件（不用 BaseHTTPMiddleware），关闭时只多两次判断
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or (not PROFILE_ADMIN_TOKEN and PROFILE_SAMPLE_RATE <= 0):
+            await self.app(scope, receive, send)
+            return
+        if scope["path"].startswith(ADMIN_PREFIX):
+            await self.app(scope, receive, send)
+            return
+
+        if _wants_profile(scope):
+            kind = "profile"
+        elif PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+            kind = "slow"
+        else:
+            await self.app(scope, receive, send)
+            return
+
+        capture = Capture(kind, scope["method"], scope["path"])
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                capture.status = message["status"]
+                if kind == "profile":
+                    headers = list(message.get("headers", []))
+                    headers.append((b"x-profile-id", capture.id.encode()))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        sampler = _StackSampler(capture.stacks) if kind == "profile" else None
+        ctx_token = _current_capture.set(capture)
+        start = time.perf_counter()
+        if sampler:
+            sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            capture.duration_ms = (time.perf_counter() - start) * 1000
+            if sampler:
+                sampler.stop()
+            _current_capture.reset(ctx_token)
+            _store(capture)
+
+
+def instrument_engine(engine):
+    """
+    给引擎挂上 SQL 计时；当前请求没有 capture 时只多一次 contextvar 读取
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if _current_capture.get() is not None:
+            conn.info.setdefault("profile_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        capture = _current_capture.get()
+        if capture is None:
+            return
+        starts = conn.info.get("profile_query_start")
+        if not starts:
+            return
+        elapsed = (time.perf_counter() - starts.pop()) * 1000
+        if len(capture.sql) < PROFILE_MAX_SQL:
+            # 只记语句不记参数，避免把密码哈希等落进剖析结果
+            capture.sql.append({"statement": statement, "duration_ms": round(elapsed, 3)})
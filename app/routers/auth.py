@@ -4,7 +4,8 @@ from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from sqlalchemy.orm import Session
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from app import database, models, schemas
+from app import models, schemas
+from app.database import get_db
 from app.security import (
     verify_password,
     get_password_hash,
@@ -17,13 +18,6 @@ from app.security import (
 router = APIRouter(prefix="/auth", tags=["auth"])
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")  # 仅用于文档显示；我们用 JSON 登录
 
-def get_db():
-    db = database.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 # 解析并校验 Bearer access_token，要求 type=access 且 token_version 匹配
 def get_current_student(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> models.Student:
     cred_err = HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
@@ -63,7 +57,6 @@ def register_student(data: schemas.StudentRegister, db: Session = Depends(get_db
     )
     db.add(student)
     db.commit()
-    db.refresh(student)
     return student
 
 # ========= 1) 表单登录（供 Swagger Authorize 使用）=========
@@ -1,24 +1,29 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from app import crud, models, schemas, database
+from app import crud, models, schemas
+from app.database import get_db
 
 router = APIRouter(
     prefix="/books",
     tags=["books"],
 )
 
-def get_db():
-    db = database.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 # 查询所有图书, skip 跳过多少条, limit 表示返回多少条，分页用
 @router.get("/", response_model=list[schemas.BookOut])
 def read_books(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
     return crud.get_books(db, skip=skip, limit=limit)
 
+# 增量同步：返回 since 之后新增/修改/删除的图书（需放在 /{book_id} 之前注册）
+@router.get("/changes", response_model=schemas.BookChangesOut)
+def read_book_changes(since: int = 0, limit: int = Query(100, ge=1, le=1000), db: Session = Depends(get_db)):
+    return crud.get_book_changes(db, since=since, limit=limit)
+
+# 压缩旧的变更流水
+@router.post("/changes/compact")
+def compact_book_changes(retention_days: int = Query(crud.BOOK_CHANGE_RETENTION_DAYS, ge=1), db: Session = Depends(get_db)):
+    deleted = crud.compact_book_changes(db, retention_days=retention_days)
+    return {"deleted": deleted}
+
 # 通过id查询单本图书
 @router.get("/{book_id}", response_model=schemas.BookOut)
 def read_book(book_id: int, db: Session = Depends(get_db)):
@@ -51,8 +56,4 @@ def delete_book(book_id: int, db: Session = Depends(get_db)):
 # 批量插入书
 @router.post("/batch", response_model=list[schemas.BookOut])
 def create_books(books: list[schemas.BookCreate], db: Session = Depends(get_db)):
-    db_books = []
-    for book in books:
-        db_book = crud.create_book(db=db, book=book)
-        db_books.append(db_book)
-    return db_books
\ No newline at end of file
+    return crud.create_books(db=db, books=books)
\ No newline at end of file
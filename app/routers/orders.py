@@ -1,6 +1,7 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
-from app import crud, models, schemas, database
+from app import archive, crud, models, schemas
+from app.database import get_db
 from datetime import datetime, timedelta
 from app.routers.auth import get_current_student
 from pydantic import BaseModel
@@ -10,13 +11,6 @@ router = APIRouter(
     tags=["orders"],
 )
 
-def get_db():
-    db = database.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 # 添加学生借阅信息（管理员/馆员使用：显式传 student_id）
 @router.post("/", response_model=schemas.BookOrderOut)
 def create_book_order(order: schemas.BookOrderCreate, db: Session = Depends(get_db)):
@@ -58,20 +52,34 @@ def create_book_order_for_me(payload: BorrowMePayload,
     )
     return crud.create_book_order(db=db, book_order=order)
 
-# 获取所有书本借阅记录
+# 获取所有书本借阅记录（since: 只看该时间之后借出的；早于归档线时会带上归档数据）
 @router.get("/books", response_model=list[schemas.BookOrderOut])
-def get_book_orders(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    return crud.get_book_orders(db=db, skip=skip, limit=limit)
+def get_book_orders(skip: int = 0, limit: int = 10, since: datetime | None = None,
+                    db: Session = Depends(get_db)):
+    return crud.get_book_orders(db=db, skip=skip, limit=limit, since=since)
 
 # 获取某名学生借阅记录
 @router.get("/students/{student_id}", response_model=list[schemas.BookOrderOut])
-def get_student_orders(student_id: int, db: Session = Depends(get_db)):
-    return crud.get_student_orders(db=db, student_id=student_id)
+def get_student_orders(student_id: int, since: datetime | None = None, db: Session = Depends(get_db)):
+    return crud.get_student_orders(db=db, student_id=student_id, since=since)
 
 # 获取某一本书的借阅记录
 @router.get("/books/{book_id}", response_model=list[schemas.BookOrderOut])
-def get_book_borrow_records(book_id: int, db: Session = Depends(get_db)):
-    return crud.get_book_borrow_records(db=db, book_id=book_id)
+def get_book_borrow_records(book_id: int, since: datetime | None = None, db: Session = Depends(get_db)):
+    return crud.get_book_borrow_records(db=db, book_id=book_id, since=since)
+
+# —— 冷热归档（管理员/馆员操作，可由定时任务调用）——
+@router.post("/archive/run")
+def run_order_archive(older_than_days: int = Query(archive.ARCHIVE_AFTER_DAYS, ge=1),
+                      batch_size: int = Query(archive.ARCHIVE_BATCH_SIZE, ge=1, le=5000),
+                      db: Session = Depends(get_db)):
+    archived = archive.archive_returned_orders(db, older_than_days=older_than_days, batch_size=batch_size)
+    return {"archived": archived}
+
+# 热表规模指标
+@router.get("/archive/stats")
+def get_order_archive_stats(db: Session = Depends(get_db)):
+    return archive.get_order_table_stats(db)
 
 # —— 还书（管理员/馆员操作）——
 @router.put("/{order_id}/return", response_model=schemas.BookOrderOut)
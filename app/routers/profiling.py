@@ -0,0 +1,39 @@
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+from app import profiling
+
+router = APIRouter(
+    prefix=profiling.ADMIN_PREFIX,
+    tags=["admin"],
+)
+
+# 与中间件共用同一个管理员 token；未配置 token 时接口整体不可用
+def require_profile_admin(x_profile_token: str | None = Header(None)):
+    if not profiling.check_admin_token(x_profile_token):
+        raise HTTPException(status_code=403, detail="Profiling admin token required")
+
+def _get_capture_or_404(capture_id: str):
+    capture = profiling.get_capture(capture_id)
+    if not capture:
+        raise HTTPException(status_code=404, detail="Capture not found")
+    return capture
+
+# 列出已保存的剖析结果（单请求剖析 + 最慢的 N 个请求）
+@router.get("/", dependencies=[Depends(require_profile_admin)])
+def list_profiles():
+    return profiling.list_captures()
+
+# 查看单个剖析结果：SQL 明细和热点函数
+@router.get("/{capture_id}", dependencies=[Depends(require_profile_admin)])
+def read_profile(capture_id: str, top: int = 30):
+    return _get_capture_or_404(capture_id).detail(top=top)
+
+# 下载折叠栈，可直接喂给 flamegraph.pl / speedscope
+@router.get("/{capture_id}/folded", response_class=PlainTextResponse,
+            dependencies=[Depends(require_profile_admin)])
+def download_profile(capture_id: str):
+    capture = _get_capture_or_404(capture_id)
+    return PlainTextResponse(
+        capture.folded(),
+        headers={"Content-Disposition": f'attachment; filename="{capture_id}.folded"'},
+    )
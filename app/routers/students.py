@@ -1,19 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from app import crud, models, schemas, database
+from app import crud, models, schemas
+from app.database import get_db
+from datetime import datetime
 
 router = APIRouter(
     prefix="/students",
     tags=["students"],
 )
 
-def get_db():
-    db = database.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 # 添加学生信息
 @router.post("/", response_model=schemas.StudentOut)
 def create_student(student: schemas.StudentCreate, db: Session = Depends(get_db)):
@@ -31,10 +26,11 @@ def create_book_order(order: schemas.BookOrderCreate, db: Session = Depends(get_
 
 # 获取书本借阅记录
 @router.get("/orders", response_model=list[schemas.BookOrderOut])
-def get_book_orders(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    return crud.get_book_orders(db=db, skip=skip, limit=limit)
+def get_book_orders(skip: int = 0, limit: int = 10, since: datetime | None = None,
+                    db: Session = Depends(get_db)):
+    return crud.get_book_orders(db=db, skip=skip, limit=limit, since=since)
 
 # 获取学生借阅记录
 @router.get("/{student_id}/orders", response_model=list[schemas.BookOrderOut])
-def get_student_orders(student_id: int, db: Session = Depends(get_db)):
-    return crud.get_student_orders(db=db, student_id=student_id)
\ No newline at end of file
+def get_student_orders(student_id: int, since: datetime | None = None, db: Session = Depends(get_db)):
+    return crud.get_student_orders(db=db, student_id=student_id, since=since)
\ No newline at end of file
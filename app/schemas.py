@@ -19,6 +19,19 @@ class BookOut(BookBase):
     class Config:
         orm_mode = True
 
+# 图书增量同步：since 为上次拿到的 next_token，首次同步传 0
+class BookChangeOut(BaseModel):
+    seq: int
+    book_id: int
+    op: str                      # insert, update, delete
+    book: BookOut | None = None  # delete 时为空（墓碑）
+
+class BookChangesOut(BaseModel):
+    changes: list[BookChangeOut]
+    next_token: int
+    has_more: bool = False
+    resync_required: bool = False  # token 已被压缩清理，需要重新全量拉取 GET /books/
+
 # ---------- Student ----------
 # 学生模型 
 class StudentBase(BaseModel):
@@ -0,0 +1,6 @@
+USE library_db;
+-- 需要 MySQL 8.0+：自增计数器持久化，重启后不会按 MAX(id)+1 复用已归档订单的 id
+-- 已有库补建 book_orders 上的组合索引（book_orders_archive 由 create_all 自动创建）
+CREATE INDEX ix_book_orders_student_status ON book_orders (student_id, status);
+CREATE INDEX ix_book_orders_book_status ON book_orders (book_id, status);
+CREATE INDEX ix_book_orders_status_return ON book_orders (status, return_date);
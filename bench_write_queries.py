@@ -0,0 +1,138 @@
+# 统计每次写操作发出的 SQL 条数：旧写法（commit 后 refresh、先 SELECT 再改）vs 现在的 crud
+# 用法：python bench_write_queries.py
+# 默认用内存 SQLite，不碰业务库；也可以 BENCH_DATABASE_URL=mysql+pymysql://... 指向一个空的测试库
+import os
+from datetime import datetime
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import crud, models, schemas
+
+BENCH_DATABASE_URL = os.getenv("BENCH_DATABASE_URL", "sqlite://")
+ROUNDS = 20
+
+
+# ---------- 旧写法（改造前的 crud，原样保留用于对比）----------
+def legacy_create_book(db, book):
+    db_book = models.Book(**book.dict())
+    db.add(db_book)
+    db.flush()
+    crud._record_book_change(db, db_book.id, "insert")
+    db.commit()
+    db.refresh(db_book)
+    return db_book
+
+def legacy_update_book(db, book_id, book):
+    db_book = db.query(models.Book).filter(models.Book.id == book_id).first()
+    if db_book:
+        for key, value in book.dict().items():
+            setattr(db_book, key, value)
+        crud._record_book_change(db, book_id, "update")
+        db.commit()
+        db.refresh(db_book)
+    return db_book
+
+def legacy_create_book_order(db, book_order):
+    db_order = models.BookOrder(**book_order.dict())
+    db.add(db_order)
+    db.commit()
+    db.refresh(db_order)
+    return db_order
+
+def legacy_mark_order_returned(db, order_id, return_date):
+    order = db.query(models.BookOrder).filter(models.BookOrder.id == order_id).first()
+    if not order:
+        return None
+    order.status = "returned"
+    order.return_date = return_date
+    db.commit()
+    db.refresh(order)
+    return order
+
+
+def make_engine():
+    if BENCH_DATABASE_URL.startswith("sqlite"):
+        engine = create_engine(BENCH_DATABASE_URL, connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    else:
+        engine = create_engine(BENCH_DATABASE_URL)
+    models.Base.metadata.create_all(bind=engine)
+    return engine
+
+
+def count_queries(engine, session_factory, fn):
+    """
+    每轮新开一个会话（对应一次请求），返回平均每次写操作的 SQL 条数
+    """
+    counter = {"n": 0}
+
+    def _count(*_):
+        counter["n"] += 1
+
+    event.listen(engine, "before_cursor_execute", _count)
+    try:
+        for i in range(ROUNDS):
+            db = session_factory()
+            try:
+                fn(db, i)
+            finally:
+                db.close()
+    finally:
+        event.remove(engine, "before_cursor_execute", _count)
+    return counter["n"] / ROUNDS
+
+
+def run():
+    engine = make_engine()
+    # 旧写法用 SQLAlchemy 默认的 expire_on_commit=True，新写法用 app.database 里的配置
+    legacy_session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    current_session = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+    setup = current_session()
+    student = models.Student(student_no="bench", password_hash="x", name="bench")
+    seed_book = models.Book(title="seed", author="bench")
+    setup.add_all([student, seed_book])
+    setup.commit()
+    student_id, book_id = student.id, seed_book.id
+    order_ids = []
+    for _ in range(ROUNDS * 2):
+        order = models.BookOrder(book_id=book_id, student_id=student_id, borrow_date=datetime.utcnow())
+        setup.add(order)
+        setup.flush()
+        order_ids.append(order.id)
+    setup.commit()
+    setup.close()
+
+    book_in = schemas.BookCreate(title="bench", author="bench")
+    order_in = schemas.BookOrderCreate(book_id=book_id, student_id=student_id, borrow_date=datetime.utcnow())
+    now = datetime.utcnow()
+
+    cases = [
+        ("create_book",
+         lambda db, i: legacy_create_book(db, book_in),
+         lambda db, i: crud.create_book(db, book_in)),
+        # 每轮标题都不同，保证两边都真的发出 UPDATE（值不变时旧写法会跳过 UPDATE）
+        ("update_book",
+         lambda db, i: legacy_update_book(db, book_id, schemas.BookUpdate(title=f"before{i}", author="bench")),
+         lambda db, i: crud.update_book(db, book_id, schemas.BookUpdate(title=f"after{i}", author="bench"))),
+        ("create_book_order",
+         lambda db, i: legacy_create_book_order(db, order_in),
+         lambda db, i: crud.create_book_order(db, order_in)),
+        # 还书路由会先 get_order 校验，这里连同它一起计数
+        ("return_book (route)",
+         lambda db, i: (crud.get_order(db, order_ids[i]),
+                        legacy_mark_order_returned(db, order_ids[i], now)),
+         lambda db, i: (crud.get_order(db, order_ids[ROUNDS + i]),
+                        crud.mark_order_returned(db, order_ids[ROUNDS + i], now))),
+    ]
+
+    print(f"{'operation':<22}{'before':>8}{'after':>8}   (SQL statements per write, {engine.dialect.name})")
+    for name, before, after in cases:
+        b = count_queries(engine, legacy_session, before)
+        a = count_queries(engine, current_session, after)
+        print(f"{name:<22}{b:>8.1f}{a:>8.1f}")
+
+
+if __name__ == "__main__":
+    run()